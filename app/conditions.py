@@ -0,0 +1,192 @@
+"""
+Safe evaluation of conditional edge expressions.
+
+A condition such as "quality_score >= 7 or iteration >= 5" is parsed once
+into a tree of closures over the workflow state. Only a small subset of
+Python expressions is accepted: comparisons, boolean, arithmetic, bitwise
+and unary operators, conditional expressions, state variable names,
+constants, subscripts and slices, and list/tuple/set/dict literals.
+Anything else (calls, attribute access, lambdas, ...) is rejected at
+compile time, so conditions cannot reach arbitrary Python objects.
+"""
+
+import ast
+import operator
+from typing import Any, Callable, Dict
+
+Evaluator = Callable[[Dict[str, Any]], Any]
+
+_BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+    ast.BitAnd: operator.and_,
+    ast.BitOr: operator.or_,
+    ast.BitXor: operator.xor,
+}
+
+_UNARY_OPS = {
+    ast.Not: operator.not_,
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+    ast.Invert: operator.invert,
+}
+
+_COMPARE_OPS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Is: operator.is_,
+    ast.IsNot: operator.is_not,
+    ast.In: lambda left, right: left in right,
+    ast.NotIn: lambda left, right: left not in right,
+}
+
+_CONTAINERS = {ast.List: list, ast.Tuple: tuple, ast.Set: set}
+
+
+def compile_condition(condition: str) -> Evaluator:
+    """
+    Compile a condition expression into a function of the workflow state.
+    
+    Args:
+        condition: Expression as string (e.g., "quality_score >= 7")
+    
+    Returns:
+        Callable taking the state dict and returning the expression's value
+    
+    Raises:
+        SyntaxError: If the expression cannot be parsed
+        ValueError: If the expression uses unsupported syntax
+    """
+    tree = ast.parse(condition, mode="eval")
+    return _compile(tree.body)
+
+
+def _compile(node: ast.AST) -> Evaluator:
+    """Build the evaluator for a single expression node"""
+    if isinstance(node, ast.Constant):
+        value = node.value
+        return lambda state: value
+    
+    if isinstance(node, ast.Name):
+        return _compile_name(node.id)
+    
+    if isinstance(node, ast.BoolOp):
+        return _compile_bool_op(node)
+    
+    if isinstance(node, ast.Compare):
+        return _compile_compare(node)
+    
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+        op = _BINARY_OPS[type(node.op)]
+        left = _compile(node.left)
+        right = _compile(node.right)
+        return lambda state: op(left(state), right(state))
+    
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+        op = _UNARY_OPS[type(node.op)]
+        operand = _compile(node.operand)
+        return lambda state: op(operand(state))
+    
+    if isinstance(node, ast.IfExp):
+        test = _compile(node.test)
+        body = _compile(node.body)
+        orelse = _compile(node.orelse)
+        return lambda state: body(state) if test(state) else orelse(state)
+    
+    if isinstance(node, ast.Subscript):
+        value = _compile(node.value)
+        index = _compile(node.slice)
+        return lambda state: value(state)[index(state)]
+    
+    if isinstance(node, ast.Slice):
+        return _compile_slice(node)
+    
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        elements = [_compile(element) for element in node.elts]
+        container = _CONTAINERS[type(node)]
+        return lambda state: container(element(state) for element in elements)
+    
+    if isinstance(node, ast.Dict):
+        return _compile_dict(node)
+    
+    raise ValueError(f"Unsupported expression in condition: {type(node).__name__}")
+
+
+def _compile_name(name: str) -> Evaluator:
+    """Look up a state variable, failing like an undefined Python name"""
+    def load(state: Dict[str, Any]) -> Any:
+        try:
+            return state[name]
+        except KeyError:
+            raise NameError(f"name '{name}' is not defined") from None
+    return load
+
+
+def _compile_slice(node: ast.Slice) -> Evaluator:
+    """Slice object for a[lower:upper:step], omitted bounds being None"""
+    bounds = [
+        _compile(bound) if bound is not None else None
+        for bound in (node.lower, node.upper, node.step)
+    ]
+    return lambda state: slice(*(bound(state) if bound else None for bound in bounds))
+
+
+def _compile_dict(node: ast.Dict) -> Evaluator:
+    """Dict literal; a None key marks a **mapping to unpack"""
+    items = [
+        (_compile(key) if key is not None else None, _compile(value))
+        for key, value in zip(node.keys, node.values)
+    ]
+    
+    def evaluate(state: Dict[str, Any]) -> Dict[Any, Any]:
+        result = {}
+        for key, value in items:
+            if key is None:
+                result.update({**value(state)})
+            else:
+                result[key(state)] = value(state)
+        return result
+    return evaluate
+
+
+def _compile_bool_op(node: ast.BoolOp) -> Evaluator:
+    """Short-circuiting and/or returning the deciding operand, as Python does"""
+    operands = [_compile(value) for value in node.values]
+    stop_on_truthy = isinstance(node.op, ast.Or)
+    
+    def evaluate(state: Dict[str, Any]) -> Any:
+        for operand in operands:
+            result = operand(state)
+            if bool(result) is stop_on_truthy:
+                return result
+        return result
+    return evaluate
+
+
+def _compile_compare(node: ast.Compare) -> Evaluator:
+    """Chained comparison (a < b <= c), evaluating each operand at most once"""
+    left = _compile(node.left)
+    steps = []
+    for op, comparator in zip(node.ops, node.comparators):
+        if type(op) not in _COMPARE_OPS:
+            raise ValueError(f"Unsupported comparison in condition: {type(op).__name__}")
+        steps.append((_COMPARE_OPS[type(op)], _compile(comparator)))
+    
+    def evaluate(state: Dict[str, Any]) -> Any:
+        current = left(state)
+        for op, comparator in steps:
+            right = comparator(state)
+            if not op(current, right):
+                return False
+            current = right
+        return True
+    return evaluate
@@ -2,21 +2,53 @@
 Database models and operations using SQLAlchemy.
 """
 
-from sqlalchemy import create_engine, Column, String, Text, DateTime, Enum as SQLEnum
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from datetime import datetime
+from sqlalchemy import (
+    create_engine, event, inspect, insert, select, update, table, column,
+    Column, Integer, String, Text, DateTime, Enum as SQLEnum
+)
+from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import QueuePool
+import asyncio
 import json
-from typing import Optional
+import math
+import re
+from datetime import datetime
+import orjson
+from typing import Any, Dict, List, Optional
 from app.models import ExecutionStatus
 
 # Database setup
 DATABASE_URL = "sqlite:///./workflow_engine.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# LIFO checkout keeps reusing the most recently returned connection
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=QueuePool,
+    pool_size=5,
+    max_overflow=10,
+    pool_use_lifo=True
+)
+SessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=engine,
+    expire_on_commit=False
+)
 Base = declarative_base()
 
 
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_conn, _connection_record):
+    """Use WAL so per-node run updates don't block concurrent state reads"""
+    cursor = dbapi_conn.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA cache_size=-65536")  # 64 MB
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")  # 256 MB
+    cursor.close()
+
+
 class GraphDB(Base):
     """Database model for workflow graphs"""
     __tablename__ = "graphs"
@@ -36,107 +68,261 @@ class RunDB(Base):
     status = Column(SQLEnum(ExecutionStatus), default=ExecutionStatus.PENDING)
     initial_state = Column(Text)  # JSON string
     current_state = Column(Text)  # JSON string
-    execution_log = Column(Text)  # JSON string (list)
     error = Column(Text, nullable=True)
     started_at = Column(DateTime, default=datetime.utcnow)
     completed_at = Column(DateTime, nullable=True)
 
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+class RunLogDB(Base):
+    """Database model for workflow run log entries (append-only)"""
+    __tablename__ = "run_logs"
+    
+    run_id = Column(String, primary_key=True)
+    seq = Column(Integer, primary_key=True)  # 1-based, contiguous per run
+    ts = Column(String)  # "YYYY-MM-DD HH:MM:SS.mmm" (UTC)
+    message = Column(Text)
+
+
+def format_log_entry(ts: str, message: str) -> str:
+    """Render a log entry as it appears in the execution log"""
+    return f"[{ts}] {message}"
+
+
+# Integers orjson would read back as a float: 20+ digits, or a negative
+# number of 19+ digits (below -2**63)
+_WIDE_INT_RE = re.compile(r"-\d{19}|\d{20}")
+
+
+def _has_non_finite(obj: Any) -> bool:
+    """Whether a JSON-like value contains NaN or an infinite float"""
+    if isinstance(obj, float):
+        return not math.isfinite(obj)
+    if isinstance(obj, dict):
+        return any(_has_non_finite(value) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return any(_has_non_finite(item) for item in obj)
+    return False
+
+
+def dump_json(obj: Any) -> str:
+    """
+    Serialise a value to JSON text.
+    
+    orjson is used whenever it represents the value exactly. Integers beyond
+    64 bits (which orjson rejects) and NaN/Infinity (which it writes as
+    null) are encoded by the standard json module instead, as before.
+    """
+    try:
+        data = orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    except orjson.JSONEncodeError:
+        return json.dumps(obj)
+    if b"null" in data and _has_non_finite(obj):
+        return json.dumps(obj)
+    return data.decode()
+
+
+def load_json(text: str) -> Any:
+    """
+    Parse JSON text written by dump_json.
+    
+    Falls back to the standard json module for text orjson cannot read
+    exactly: NaN/Infinity tokens and integers beyond 64 bits.
+    """
+    if _WIDE_INT_RE.search(text) is None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(text)
+
+
+# Splits a rendered log entry back into its timestamp and message
+_LOG_ENTRY_RE = re.compile(r"\[([^\]]*)\] (.*)", re.DOTALL)
+
+
+def _copy_legacy_logs():
+    """
+    Copy logs kept in the old runs.execution_log JSON column into run_logs.
+    
+    Databases created before run_logs existed still hold each run's log in
+    that column. Runs that already have run_logs rows are left alone, so
+    this only does work once per legacy run.
+    """
+    columns = {column["name"] for column in inspect(engine).get_columns("runs")}
+    if "execution_log" not in columns:
+        return
+    
+    legacy_runs = table("runs", column("id"), column("execution_log"))
+    with engine.begin() as conn:
+        rows = conn.execute(
+            select(legacy_runs.c.id, legacy_runs.c.execution_log)
+            .where(
+                legacy_runs.c.execution_log.is_not(None),
+                legacy_runs.c.id.not_in(select(RunLogDB.run_id).distinct())
+            )
+        )
+        entries = []
+        for run_id, execution_log in rows:
+            for seq, entry in enumerate(load_json(execution_log) or [], start=1):
+                match = _LOG_ENTRY_RE.fullmatch(entry)
+                ts, message = match.groups() if match else ("", entry)
+                entries.append({"run_id": run_id, "seq": seq, "ts": ts, "message": message})
+        if entries:
+            conn.execute(insert(RunLogDB), entries)
+
+
+def init_db():
+    """Create any missing tables (run once at application startup)"""
+    Base.metadata.create_all(bind=engine)
+    _copy_legacy_logs()
 
 
 def get_db():
     """Get database session"""
-    db = SessionLocal()
-    try:
+    with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
 class DatabaseOperations:
     """Helper class for database operations"""
     
     @staticmethod
-    def create_graph(graph_id: str, name: str, definition: dict) -> GraphDB:
-        """Create a new graph in the database"""
-        db = SessionLocal()
-        try:
+    def create_graph(graph_id: str, name: str, definition: str) -> GraphDB:
+        """Create a new graph in the database from its JSON definition"""
+        with SessionLocal() as db:
             graph = GraphDB(
                 id=graph_id,
                 name=name,
-                definition=json.dumps(definition)
+                definition=definition
             )
             db.add(graph)
             db.commit()
-            db.refresh(graph)
             return graph
-        finally:
-            db.close()
     
     @staticmethod
     def get_graph(graph_id: str) -> Optional[GraphDB]:
         """Retrieve a graph by ID"""
-        db = SessionLocal()
-        try:
+        with SessionLocal() as db:
             return db.query(GraphDB).filter(GraphDB.id == graph_id).first()
-        finally:
-            db.close()
     
     @staticmethod
     def create_run(run_id: str, graph_id: str, initial_state: dict) -> RunDB:
         """Create a new workflow run"""
-        db = SessionLocal()
-        try:
+        with SessionLocal() as db:
             run = RunDB(
                 id=run_id,
                 graph_id=graph_id,
                 status=ExecutionStatus.PENDING,
-                initial_state=json.dumps(initial_state),
-                current_state=json.dumps(initial_state),
-                execution_log=json.dumps([])
+                initial_state=dump_json(initial_state),
+                current_state=dump_json(initial_state)
             )
             db.add(run)
             db.commit()
-            db.refresh(run)
             return run
-        finally:
-            db.close()
     
     @staticmethod
     def get_run(run_id: str) -> Optional[RunDB]:
         """Retrieve a run by ID"""
-        db = SessionLocal()
-        try:
+        with SessionLocal() as db:
             return db.query(RunDB).filter(RunDB.id == run_id).first()
-        finally:
-            db.close()
+    
+    @staticmethod
+    def get_run_status(run_id: str) -> Optional[ExecutionStatus]:
+        """Retrieve only the status of a run"""
+        with SessionLocal() as db:
+            return db.execute(
+                select(RunDB.status).where(RunDB.id == run_id)
+            ).scalar_one_or_none()
     
     @staticmethod
     def update_run(
         run_id: str,
         status: Optional[ExecutionStatus] = None,
         current_state: Optional[dict] = None,
-        execution_log: Optional[list] = None,
+        log_entries: Optional[List[Dict[str, Any]]] = None,
         error: Optional[str] = None,
         completed_at: Optional[datetime] = None
     ):
-        """Update a workflow run"""
-        db = SessionLocal()
-        try:
-            run = db.query(RunDB).filter(RunDB.id == run_id).first()
-            if run:
-                if status:
-                    run.status = status
-                if current_state is not None:
-                    run.current_state = json.dumps(current_state)
-                if execution_log is not None:
-                    run.execution_log = json.dumps(execution_log)
-                if error is not None:
-                    run.error = error
-                if completed_at is not None:
-                    run.completed_at = completed_at
-                db.commit()
-        finally:
-            db.close()
+        """
+        Update a workflow run.
+        
+        log_entries are appended to the run's log (dicts with seq, ts and
+        message) in the same transaction as the column updates.
+        """
+        changes = {}
+        if status is not None:
+            changes["status"] = status
+        if current_state is not None:
+            changes["current_state"] = dump_json(current_state)
+        if error is not None:
+            changes["error"] = error
+        if completed_at is not None:
+            changes["completed_at"] = completed_at
+        if not changes and not log_entries:
+            return
+        
+        with SessionLocal() as db:
+            if changes:
+                db.execute(update(RunDB).where(RunDB.id == run_id).values(**changes))
+            if log_entries:
+                db.execute(
+                    insert(RunLogDB),
+                    [{"run_id": run_id, **entry} for entry in log_entries]
+                )
+            db.commit()
+    
+    @staticmethod
+    def get_run_logs(run_id: str, after_seq: int = 0) -> List[str]:
+        """Retrieve a run's log entries with seq greater than after_seq, in order"""
+        with SessionLocal() as db:
+            rows = db.execute(
+                select(RunLogDB.ts, RunLogDB.message)
+                .where(RunLogDB.run_id == run_id, RunLogDB.seq > after_seq)
+                .order_by(RunLogDB.seq)
+            )
+            return [format_log_entry(ts, message) for ts, message in rows]
+
+
+class AsyncDatabaseOperations:
+    """
+    Awaitable versions of DatabaseOperations for use from async code.
+    
+    Each call runs the blocking SQLAlchemy operation in a worker thread so a
+    SQLite commit doesn't stall the event loop.
+    """
+    
+    @staticmethod
+    async def create_graph(graph_id: str, name: str, definition: str) -> GraphDB:
+        """Create a new graph in the database from its JSON definition"""
+        return await asyncio.to_thread(
+            DatabaseOperations.create_graph, graph_id, name, definition
+        )
+    
+    @staticmethod
+    async def create_run(run_id: str, graph_id: str, initial_state: dict) -> RunDB:
+        """Create a new workflow run"""
+        return await asyncio.to_thread(
+            DatabaseOperations.create_run, run_id, graph_id, initial_state
+        )
+    
+    @staticmethod
+    async def get_run(run_id: str) -> Optional[RunDB]:
+        """Retrieve a run by ID"""
+        return await asyncio.to_thread(DatabaseOperations.get_run, run_id)
+    
+    @staticmethod
+    async def get_run_status(run_id: str) -> Optional[ExecutionStatus]:
+        """Retrieve only the status of a run"""
+        return await asyncio.to_thread(DatabaseOperations.get_run_status, run_id)
+    
+    @staticmethod
+    async def update_run(run_id: str, **changes):
+        """Update a workflow run (see DatabaseOperations.update_run)"""
+        await asyncio.to_thread(DatabaseOperations.update_run, run_id, **changes)
+    
+    @staticmethod
+    async def get_run_logs(run_id: str, after_seq: int = 0) -> List[str]:
+        """Retrieve a run's log entries with seq greater than after_seq, in order"""
+        return await asyncio.to_thread(
+            DatabaseOperations.get_run_logs, run_id, after_seq
+        )
@@ -3,16 +3,36 @@ Core workflow engine for executing graphs.
 Supports nodes, edges, state management, conditional branching, and looping.
 """
 
-from typing import Dict, Any, List, Optional, Callable
+from typing import Dict, Any, List, Optional, Callable, Protocol, Tuple, Union
 import asyncio
+import time
 from datetime import datetime
 from app.models import ExecutionStatus, GraphDefinition
 from app.tools import tool_registry
-from app.database import DatabaseOperations
+from app.conditions import Evaluator, compile_condition
+from app.database import AsyncDatabaseOperations, format_log_entry
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Minimum seconds between progress writes to the database while running
+FLUSH_INTERVAL = 0.25
+
+# Normalized edge: a target node (None for end) or (condition, if_true, if_false)
+NextSpec = Union[Optional[str], Tuple[str, Optional[str], Optional[str]]]
+
+
+class LogSink(Protocol):
+    """Receives each log entry as it is written (e.g. an asyncio.Queue)"""
+    
+    def put_nowait(self, entry: str) -> None:
+        ...
+
+
+def _end_to_none(node_name: Optional[str]) -> Optional[str]:
+    """Map the "end" pseudo-node to None"""
+    return None if node_name == "end" else node_name
+
 
 class WorkflowEngine:
     """
@@ -26,18 +46,93 @@ class WorkflowEngine:
     - Execution logging
     """
     
-    def __init__(self, graph_definition: GraphDefinition):
+    def __init__(
+        self,
+        graph_definition: GraphDefinition,
+        log_queue: Optional[LogSink] = None
+    ):
         self.graph = graph_definition
         self.execution_log: List[str] = []
+        self.log_queue = log_queue
         self.max_iterations = graph_definition.max_iterations
+        self._last_flush = 0.0
+        self._pending_logs: List[Dict[str, Any]] = []
+        # The initial state is stored by create_run; only re-save after a tool runs
+        self._state_dirty = False
+        
+        # Resolve each node's tool and edge once instead of on every visit
+        self._evaluators: Dict[str, Evaluator] = {}
+        self._plan: Dict[str, Tuple[str, NextSpec]] = {
+            name: (node_config.tool, self._normalize_next(node_config.next))
+            for name, node_config in graph_definition.nodes.items()
+        }
+    
+    def _normalize_next(self, next_config: Union[str, Dict[str, Any]]) -> NextSpec:
+        """Reduce a node's next config to a NextSpec, compiling any condition"""
+        if isinstance(next_config, str):
+            return _end_to_none(next_config)
+        
+        condition = next_config.get("condition")
+        if not condition:
+            return None
+        
+        try:
+            self._compile_condition(condition)
+        except (SyntaxError, ValueError):
+            pass  # Reported by evaluate_condition when reached
+        return (
+            condition,
+            _end_to_none(next_config.get("if_true")),
+            _end_to_none(next_config.get("if_false"))
+        )
     
     def log(self, message: str):
         """Add a message to the execution log"""
-        timestamp = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-        log_entry = f"[{timestamp}] {message}"
+        timestamp = datetime.utcnow().isoformat(sep=" ", timespec="milliseconds")
+        log_entry = format_log_entry(timestamp, message)
         self.execution_log.append(log_entry)
+        self._pending_logs.append({
+            "seq": len(self.execution_log),
+            "ts": timestamp,
+            "message": message
+        })
+        if self.log_queue is not None:
+            self.log_queue.put_nowait(log_entry)
         logger.info(message)
     
+    async def _flush(self, run_id: str, state: Dict[str, Any], **changes):
+        """
+        Persist run progress along with log entries written since the last flush.
+        
+        The state is only serialised if a tool has run since it was last saved.
+        
+        Args:
+            run_id: Unique identifier for this execution run
+            state: Current workflow state
+            **changes: Extra columns to update (status, error, completed_at)
+        """
+        if self._state_dirty:
+            changes["current_state"] = state
+            self._state_dirty = False
+        if self._pending_logs:
+            changes["log_entries"] = self._pending_logs
+            self._pending_logs = []
+        await AsyncDatabaseOperations.update_run(run_id, **changes)
+        self._last_flush = time.monotonic()
+    
+    async def _maybe_flush(self, run_id: str, state: Dict[str, Any]):
+        """Persist run progress if the last write is older than FLUSH_INTERVAL"""
+        if time.monotonic() - self._last_flush > FLUSH_INTERVAL:
+            await self._flush(run_id, state)
+    
+    def _compile_condition(self, condition: str) -> Evaluator:
+        """Compile a condition expression, caching the evaluator by its text"""
+        evaluator = self._evaluators.get(condition)
+        if evaluator is None:
+            evaluator = compile_condition(condition)
+            self._evaluators[condition] = evaluator
+        return evaluator
+    
     def evaluate_condition(self, condition: str, state: Dict[str, Any]) -> bool:
         """
         Evaluate a conditional expression against the current state.
@@ -50,9 +145,8 @@ class WorkflowEngine:
             Boolean result of the condition
         """
         try:
-            # Create a safe evaluation context with only the state variables
-            eval_context = {k: v for k, v in state.items() if isinstance(k, str)}
-            result = eval(condition, {"__builtins__": {}}, eval_context)
+            # Only state variables are in scope; see app.conditions
+            result = self._compile_condition(condition)(state)
             return bool(result)
         except Exception as e:
             self.log(f"Error evaluating condition '{condition}': {str(e)}")
@@ -73,32 +167,24 @@ class WorkflowEngine:
         Returns:
             Name of the next node, or None if workflow should end
         """
-        node_config = self.graph.nodes.get(current_node)
-        if not node_config:
+        plan = self._plan.get(current_node)
+        if not plan:
             return None
         
-        next_config = node_config.next
+        next_spec = plan[1]
         
-        # Simple string next node
-        if isinstance(next_config, str):
-            return next_config if next_config != "end" else None
+        # Simple next node (or end)
+        if not isinstance(next_spec, tuple):
+            return next_spec
         
         # Conditional routing
-        if isinstance(next_config, dict):
-            condition = next_config.get("condition")
-            if_true = next_config.get("if_true")
-            if_false = next_config.get("if_false")
-            
-            if condition:
-                result = self.evaluate_condition(condition, state)
-                self.log(f"Condition '{condition}' evaluated to: {result}")
-                
-                next_node = if_true if result else if_false
-                return next_node if next_node != "end" else None
+        condition, if_true, if_false = next_spec
+        result = self.evaluate_condition(condition, state)
+        self.log(f"Condition '{condition}' evaluated to: {result}")
         
-        return None
+        return if_true if result else if_false
     
-    def execute_node(
+    async def execute_node(
         self, 
         node_name: str, 
         state: Dict[str, Any]
@@ -106,6 +192,11 @@ class WorkflowEngine:
         """
         Execute a single node by calling its associated tool.
         
+        Tools are synchronous and run in a worker thread so a slow tool
+        doesn't block other runs or WebSocket clients. Tools may update the
+        state in place and return the same dict, so the state is marked
+        dirty whenever a tool is invoked.
+        
         Args:
             node_name: Name of the node to execute
             state: Current workflow state
@@ -113,16 +204,17 @@ class WorkflowEngine:
         Returns:
             Updated state after node execution
         """
-        node_config = self.graph.nodes.get(node_name)
-        if not node_config:
+        plan = self._plan.get(node_name)
+        if not plan:
             raise ValueError(f"Node '{node_name}' not found in graph")
         
-        tool_name = node_config.tool
+        tool_name = plan[0]
         self.log(f"Executing node '{node_name}' with tool '{tool_name}'")
         
         try:
             tool_func = tool_registry.get(tool_name)
-            updated_state = tool_func(state)
+            self._state_dirty = True
+            updated_state = await asyncio.to_thread(tool_func, state)
             self.log(f"Node '{node_name}' completed successfully")
             return updated_state
         except Exception as e:
@@ -153,26 +245,17 @@ class WorkflowEngine:
         self.log(f"Starting workflow execution from node '{current_node}'")
         
         # Update run status to running
-        DatabaseOperations.update_run(
-            run_id=run_id,
-            status=ExecutionStatus.RUNNING,
-            current_state=state,
-            execution_log=self.execution_log
-        )
+        await self._flush(run_id, state, status=ExecutionStatus.RUNNING)
         
         try:
             while current_node and iteration_count < self.max_iterations:
                 # Execute current node
-                state = self.execute_node(current_node, state)
+                state = await self.execute_node(current_node, state)
                 visited_nodes.append(current_node)
                 iteration_count += 1
                 
-                # Update database with current progress
-                DatabaseOperations.update_run(
-                    run_id=run_id,
-                    current_state=state,
-                    execution_log=self.execution_log
-                )
+                # Update database with current progress (debounced)
+                await self._maybe_flush(run_id, state)
                 
                 # Determine next node
                 next_node = self.get_next_node(current_node, state)
@@ -187,8 +270,9 @@ class WorkflowEngine:
                 self.log(f"Transitioning from '{current_node}' to '{next_node}'")
                 current_node = next_node
                 
-                # Small delay to prevent tight loops
-                await asyncio.sleep(0.1)
+                # Yield to the event loop between nodes; runaway loops are
+                # bounded by max_iterations
+                await asyncio.sleep(0)
             
             if iteration_count >= self.max_iterations:
                 self.log(
@@ -198,11 +282,10 @@ class WorkflowEngine:
             self.log(f"Workflow execution completed. Visited {len(visited_nodes)} nodes")
             
             # Mark as completed
-            DatabaseOperations.update_run(
-                run_id=run_id,
+            await self._flush(
+                run_id,
+                state,
                 status=ExecutionStatus.COMPLETED,
-                current_state=state,
-                execution_log=self.execution_log,
                 completed_at=datetime.utcnow()
             )
             
@@ -213,11 +296,10 @@ class WorkflowEngine:
             self.log(error_msg)
             
             # Mark as failed
-            DatabaseOperations.update_run(
-                run_id=run_id,
+            await self._flush(
+                run_id,
+                state,
                 status=ExecutionStatus.FAILED,
-                current_state=state,
-                execution_log=self.execution_log,
                 error=error_msg,
                 completed_at=datetime.utcnow()
             )
@@ -232,7 +314,8 @@ class WorkflowManager:
     async def execute_workflow(
         graph_definition: GraphDefinition,
         initial_state: Dict[str, Any],
-        run_id: str
+        run_id: str,
+        log_queue: Optional[LogSink] = None
     ) -> Dict[str, Any]:
         """
         Create an engine instance and execute a workflow.
@@ -241,9 +324,10 @@ class WorkflowManager:
             graph_definition: The workflow graph to execute
             initial_state: Starting state
             run_id: Unique run identifier
+            log_queue: Optional sink that receives each log entry as it is written
             
         Returns:
             Final state after execution
         """
-        engine = WorkflowEngine(graph_definition)
+        engine = WorkflowEngine(graph_definition, log_queue=log_queue)
         return await engine.execute(initial_state, run_id)
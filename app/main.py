@@ -5,9 +5,10 @@ Provides REST API endpoints for creating and executing workflow graphs.
 
 from fastapi import FastAPI, HTTPException, BackgroundTasks, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Dict, Any
+from typing import Dict, Any, List, Set
+from contextlib import asynccontextmanager
+from functools import lru_cache
 import uuid
-import json
 import asyncio
 import logging
 from datetime import datetime
@@ -20,7 +21,10 @@ from app.models import (
     GraphStateResponse,
     ExecutionStatus
 )
-from app.database import DatabaseOperations, RunDB
+from app.database import (
+    DatabaseOperations, AsyncDatabaseOperations, RunDB, dump_json, load_json, init_db
+)
+from app.conditions import compile_condition
 from app.engine import WorkflowManager
 from app.tools import tool_registry
 
@@ -31,13 +35,22 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the database tables before serving requests"""
+    init_db()
+    yield
+
+
 # Create FastAPI app
 app = FastAPI(
     title="Workflow Engine API",
     description="A minimal yet powerful workflow/graph engine for building agent workflows",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -49,12 +62,70 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+class RunLogBroadcast:
+    """
+    Fans out the log entries of one running workflow to WebSocket clients.
+    
+    The engine publishes through put_nowait. Every subscriber gets its own
+    queue, seeded with the entries written so far, so any number of clients
+    (including late ones) each receive the full log. A None entry marks the
+    end of the run.
+    """
+    
+    def __init__(self):
+        self.entries: List[str] = []
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._closed = False
+    
+    def put_nowait(self, entry: str):
+        """Record a log entry and pass it to every subscriber"""
+        self.entries.append(entry)
+        for queue in self._subscribers:
+            queue.put_nowait(entry)
+    
+    def subscribe(self) -> asyncio.Queue:
+        """Queue receiving all entries so far, then each new one"""
+        queue = asyncio.Queue()
+        for entry in self.entries:
+            queue.put_nowait(entry)
+        if self._closed:
+            queue.put_nowait(None)
+        else:
+            self._subscribers.add(queue)
+        return queue
+    
+    def unsubscribe(self, queue: asyncio.Queue):
+        """Stop delivering entries to a queue"""
+        self._subscribers.discard(queue)
+    
+    def close(self):
+        """Signal the end of the run to every subscriber"""
+        self._closed = True
+        for queue in self._subscribers:
+            queue.put_nowait(None)
+        self._subscribers.clear()
+
+
 # WebSocket connection manager
 class ConnectionManager:
     """Manages WebSocket connections for real-time log streaming"""
     
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
+        self.log_broadcasts: Dict[str, RunLogBroadcast] = {}
+    
+    def open_log_broadcast(self, run_id: str) -> RunLogBroadcast:
+        """Create the broadcast a run publishes its log entries to"""
+        broadcast = RunLogBroadcast()
+        self.log_broadcasts[run_id] = broadcast
+        return broadcast
+    
+    def close_log_broadcast(self, run_id: str):
+        """Signal end of run to all subscribers and stop accepting new ones"""
+        broadcast = self.log_broadcasts.pop(run_id, None)
+        if broadcast is not None:
+            broadcast.close()
     
     async def connect(self, run_id: str, websocket: WebSocket):
         """Accept and store a WebSocket connection"""
@@ -126,25 +197,39 @@ async def create_graph(graph_def: GraphDefinition):
                 detail=f"Start node '{graph_def.start_node}' not found in nodes"
             )
         
-        # Validate that all tools exist
-        for node_name, node_config in graph_def.nodes.items():
-            tool_name = node_config.tool
-            try:
-                tool_registry.get(tool_name)
-            except ValueError:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Tool '{tool_name}' not found in registry for node '{node_name}'"
+        # Validate that all tools exist, reporting every missing one at once
+        missing_tools = {
+            node_config.tool for node_config in graph_def.nodes.values()
+        } - tool_registry.names()
+        if missing_tools:
+            raise HTTPException(
+                status_code=400,
+                detail="; ".join(
+                    f"Tool '{node_config.tool}' not found in registry for node '{node_name}'"
+                    for node_name, node_config in graph_def.nodes.items()
+                    if node_config.tool in missing_tools
                 )
+            )
+        
+        # Validate that every edge condition compiles, reporting all failures
+        invalid_conditions = []
+        for node_name, node_config in graph_def.nodes.items():
+            if isinstance(node_config.next, dict) and node_config.next.get("condition"):
+                try:
+                    compile_condition(node_config.next["condition"])
+                except (SyntaxError, ValueError, TypeError) as e:
+                    invalid_conditions.append(f"Invalid condition for node '{node_name}': {e}")
+        if invalid_conditions:
+            raise HTTPException(status_code=400, detail="; ".join(invalid_conditions))
         
         # Generate unique graph ID
         graph_id = str(uuid.uuid4())
         
         # Store in database
-        DatabaseOperations.create_graph(
+        await AsyncDatabaseOperations.create_graph(
             graph_id=graph_id,
             name=graph_def.name,
-            definition=graph_def.model_dump()
+            definition=graph_def.model_dump_json()
         )
         
         logger.info(f"Created graph '{graph_def.name}' with ID: {graph_id}")
@@ -158,10 +243,34 @@ async def create_graph(graph_def: GraphDefinition):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@lru_cache(maxsize=256)
+def _load_graph(graph_id: str) -> GraphDefinition:
+    """
+    Load and validate a stored graph definition.
+    
+    Graphs are immutable once created, so parsed definitions are cached by ID.
+    A missing graph raises instead of returning, so misses are never cached.
+    
+    Args:
+        graph_id: Unique graph identifier
+        
+    Returns:
+        Parsed graph definition
+    """
+    graph_db = DatabaseOperations.get_graph(graph_id)
+    if not graph_db:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Graph with ID '{graph_id}' not found"
+        )
+    return GraphDefinition.model_validate_json(graph_db.definition)
+
+
 async def execute_workflow_background(
     graph_def: GraphDefinition,
     initial_state: Dict[str, Any],
-    run_id: str
+    run_id: str,
+    log_broadcast: RunLogBroadcast
 ):
     """
     Background task to execute a workflow.
@@ -170,15 +279,19 @@ async def execute_workflow_background(
         graph_def: Graph definition
         initial_state: Initial state for execution
         run_id: Unique run identifier
+        log_broadcast: Broadcast the engine publishes log entries to
     """
     try:
         await WorkflowManager.execute_workflow(
             graph_definition=graph_def,
             initial_state=initial_state,
-            run_id=run_id
+            run_id=run_id,
+            log_queue=log_broadcast
         )
     except Exception as e:
         logger.error(f"Background workflow execution failed for run {run_id}: {e}")
+    finally:
+        manager.close_log_broadcast(run_id)
 
 
 @app.post("/graph/run", response_model=GraphRunResponse)
@@ -197,34 +310,27 @@ async def run_graph(
         Run ID and execution status
     """
     try:
-        # Retrieve graph from database
-        graph_db = DatabaseOperations.get_graph(request.graph_id)
-        if not graph_db:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Graph with ID '{request.graph_id}' not found"
-            )
-        
-        # Parse graph definition
-        graph_def_dict = json.loads(graph_db.definition)
-        graph_def = GraphDefinition(**graph_def_dict)
+        # Retrieve parsed graph definition (cached after first load)
+        graph_def = await asyncio.to_thread(_load_graph, request.graph_id)
         
         # Generate unique run ID
         run_id = str(uuid.uuid4())
         
         # Create run record in database
-        DatabaseOperations.create_run(
+        await AsyncDatabaseOperations.create_run(
             run_id=run_id,
             graph_id=request.graph_id,
             initial_state=request.initial_state
         )
         
-        # Execute workflow in background
+        # Execute workflow in background, publishing logs for WebSocket clients
+        log_broadcast = manager.open_log_broadcast(run_id)
         background_tasks.add_task(
             execute_workflow_background,
             graph_def,
             request.initial_state,
-            run_id
+            run_id,
+            log_broadcast
         )
         
         logger.info(f"Started workflow execution with run_id: {run_id}")
@@ -254,16 +360,16 @@ async def get_graph_state(run_id: str):
     """
     try:
         # Retrieve run from database
-        run_db = DatabaseOperations.get_run(run_id)
+        run_db = await AsyncDatabaseOperations.get_run(run_id)
         if not run_db:
             raise HTTPException(
                 status_code=404,
                 detail=f"Run with ID '{run_id}' not found"
             )
         
-        # Parse JSON fields
-        current_state = json.loads(run_db.current_state)
-        execution_log = json.loads(run_db.execution_log)
+        # Parse JSON state and load the log entries
+        current_state = load_json(run_db.current_state)
+        execution_log = await AsyncDatabaseOperations.get_run_logs(run_id)
         
         return GraphStateResponse(
             run_id=run_id,
@@ -282,6 +388,91 @@ async def get_graph_state(run_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _send_message(websocket: WebSocket, message: Dict[str, Any]):
+    """Send a JSON text frame, encoded once"""
+    await websocket.send_text(dump_json(message))
+
+
+async def _send_completed(websocket: WebSocket, run_id: str, run_db: RunDB):
+    """Send the final status and state of a finished run"""
+    await _send_message(websocket, {
+        "type": "completed",
+        "run_id": run_id,
+        "status": run_db.status.value,
+        "final_state": load_json(run_db.current_state)
+    })
+
+
+async def _stream_from_broadcast(
+    websocket: WebSocket,
+    run_id: str,
+    log_broadcast: RunLogBroadcast
+):
+    """
+    Push log entries as the engine publishes them.
+    
+    The subscription starts with every entry written so far, so a late
+    client still receives the full log. A None entry marks the end of the run.
+    """
+    log_queue = log_broadcast.subscribe()
+    try:
+        finished = False
+        while not finished:
+            logs = [await log_queue.get()]
+            while not log_queue.empty():
+                logs.append(log_queue.get_nowait())
+            
+            if logs[-1] is None:
+                logs.pop()
+                finished = True
+            
+            if logs:
+                await _send_message(websocket, {
+                    "type": "log",
+                    "run_id": run_id,
+                    "status": ExecutionStatus.RUNNING.value,
+                    "logs": logs
+                })
+    finally:
+        log_broadcast.unsubscribe(log_queue)
+    
+    run_db = await AsyncDatabaseOperations.get_run(run_id)
+    if run_db:
+        await _send_completed(websocket, run_id, run_db)
+
+
+async def _stream_from_database(websocket: WebSocket, run_id: str):
+    """
+    Poll the database for runs not executing in this process.
+    
+    Covers runs that already finished (one read) and runs started by
+    another worker process. Only log entries not yet sent are fetched.
+    """
+    sent = 0
+    while True:
+        status = await AsyncDatabaseOperations.get_run_status(run_id)
+        if status:
+            new_logs = await AsyncDatabaseOperations.get_run_logs(run_id, after_seq=sent)
+            
+            # Send logs written since the last poll
+            if new_logs:
+                sent += len(new_logs)
+                await _send_message(websocket, {
+                    "type": "log",
+                    "run_id": run_id,
+                    "status": status.value,
+                    "logs": new_logs
+                })
+            
+            # If completed or failed, send final message and close
+            if status in [ExecutionStatus.COMPLETED, ExecutionStatus.FAILED]:
+                run_db = await AsyncDatabaseOperations.get_run(run_id)
+                await _send_completed(websocket, run_id, run_db)
+                break
+        
+        await asyncio.sleep(0.5)  # Poll every 500ms
+
+
 @app.websocket("/ws/graph/run/{run_id}")
 async def websocket_graph_run(websocket: WebSocket, run_id: str):
     """
@@ -295,38 +486,18 @@ async def websocket_graph_run(websocket: WebSocket, run_id: str):
     
     try:
         # Send initial connection message
-        await websocket.send_json({
+        await _send_message(websocket, {
             "type": "connected",
             "run_id": run_id,
             "message": "WebSocket connected"
         })
         
-        # Keep connection alive and stream logs
-        while True:
-            # Check run status periodically
-            run_db = DatabaseOperations.get_run(run_id)
-            if run_db:
-                execution_log = json.loads(run_db.execution_log)
-                
-                # Send latest logs
-                await websocket.send_json({
-                    "type": "log",
-                    "run_id": run_id,
-                    "status": run_db.status.value,
-                    "logs": execution_log
-                })
-                
-                # If completed or failed, send final message and close
-                if run_db.status in [ExecutionStatus.COMPLETED, ExecutionStatus.FAILED]:
-                    await websocket.send_json({
-                        "type": "completed",
-                        "run_id": run_id,
-                        "status": run_db.status.value,
-                        "final_state": json.loads(run_db.current_state)
-                    })
-                    break
-            
-            await asyncio.sleep(0.5)  # Poll every 500ms
+        # Runs executing in this process push their logs; others are polled
+        log_broadcast = manager.log_broadcasts.get(run_id)
+        if log_broadcast is not None:
+            await _stream_from_broadcast(websocket, run_id, log_broadcast)
+        else:
+            await _stream_from_database(websocket, run_id)
             
     except WebSocketDisconnect:
         logger.info(f"WebSocket disconnected for run_id: {run_id}")
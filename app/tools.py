@@ -1,11 +1,18 @@
 """
 Tool registry and tool implementations.
 Tools are Python functions that can be called by workflow nodes.
+
+A tool receives the workflow state dict, may update it in place, and
+returns the resulting state (usually the same dict). The engine persists a
+snapshot of the state; tools never need to copy it.
 """
 
-from typing import Dict, Any, Callable, List
+from typing import Dict, Any, Callable, Iterable, KeysView, List, NamedTuple, Set, Tuple
 import re
 import ast
+import hashlib
+import threading
+from collections import Counter, OrderedDict, deque
 
 
 class ToolRegistry:
@@ -18,6 +25,10 @@ class ToolRegistry:
         """Register a tool function"""
         self._tools[name] = func
     
+    def bulk_register(self, tools: Iterable[Tuple[str, Callable]]):
+        """Register several (name, function) pairs at once"""
+        self._tools.update(tools)
+    
     def get(self, name: str) -> Callable:
         """Get a tool by name"""
         if name not in self._tools:
@@ -27,16 +38,187 @@ class ToolRegistry:
     def list_tools(self) -> List[str]:
         """List all registered tools"""
         return list(self._tools.keys())
+    
+    def names(self) -> KeysView[str]:
+        """Set-like view of registered tool names"""
+        return self._tools.keys()
 
 
 # Global tool registry instance
 tool_registry = ToolRegistry()
 
+# Tools defined in this module, registered together at the bottom
+_TOOLS: List[Tuple[str, Callable]] = []
+
+
+def tool(func: Callable) -> Callable:
+    """Mark a function in this module as a tool, registered under its own name"""
+    _TOOLS.append((func.__name__, func))
+    return func
+
 
 # ============================================================================
 # Code Review Tools
 # ============================================================================
 
+# Fallback for sources that cannot be parsed: code smells matched as text.
+# [^\S\n] keeps matches from spanning lines.
+_SMELL_RE = re.compile(
+    r"(?P<bare_except>except[^\S\n]*:)|(?P<print_statement>\bprint[^\S\n]*\()"
+)
+
+
+# Longest source (in characters) the review tools will parse
+MAX_REVIEW_SIZE = 1_000_000
+
+# Parse to an AST, constant-folded where the interpreter supports it (3.13+)
+_PARSE_FLAGS = ast.PyCF_ONLY_AST | getattr(ast, "PyCF_OPTIMIZED_AST", 0)
+
+# Nodes adding one decision point to cyclomatic complexity
+_DECISION_NODES = (ast.If, ast.While, ast.For, ast.ExceptHandler)
+
+
+class CodeTooLarge(ValueError):
+    """Raised for source code longer than MAX_REVIEW_SIZE"""
+
+
+class FunctionInfo(NamedTuple):
+    """Function definition found by the review analysis"""
+    name: str
+    line_start: int
+    line_end: int
+    args: Tuple[str, ...]
+    num_lines: int
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dict form stored in the workflow state"""
+        return {
+            "name": self.name,
+            "line_start": self.line_start,
+            "line_end": self.line_end,
+            "args": list(self.args),
+            "num_lines": self.num_lines
+        }
+
+
+class ReviewAnalysis:
+    """
+    Function metadata, complexity and code smells of a module, collected in
+    a single pass.
+    
+    Cyclomatic complexity starts at 1 per function and adds one per
+    if/while/for/except plus one per extra operand of and/or. A decision
+    point counts toward every function enclosing it, so nested functions
+    also contribute to their parent's score.
+    
+    Nodes are visited breadth-first with an explicit queue (the order
+    ast.walk uses), so when two functions share a name the score of the one
+    found last wins, as before.
+    
+    Bare except clauses and print() calls are recorded in `smells` by line.
+    """
+    
+    def __init__(self, tree: ast.AST):
+        self.functions: List[FunctionInfo] = []
+        self.complexity_scores: Dict[str, int] = {}
+        self.smells: Dict[int, Set[str]] = {}  # Line number -> smell types
+        
+        found = []  # (func_info, score counter) in visiting order
+        # Each node travels with the score counters of its enclosing functions
+        queue = deque([(tree, ())])
+        while queue:
+            node, owners = queue.popleft()
+            node_type = node.__class__
+            
+            if node_type is ast.FunctionDef:
+                line_end = node.end_lineno or node.lineno
+                func_info = FunctionInfo(
+                    name=node.name,
+                    line_start=node.lineno,
+                    line_end=line_end,
+                    args=tuple(arg.arg for arg in node.args.args),
+                    num_lines=line_end - node.lineno + 1
+                )
+                score = [1]  # Base complexity
+                found.append((func_info, score))
+                owners = owners + (score,)
+            elif isinstance(node, _DECISION_NODES):
+                for owner in owners:
+                    owner[0] += 1
+                if node_type is ast.ExceptHandler and node.type is None:
+                    self.smells.setdefault(node.lineno, set()).add("bare_except")
+            elif node_type is ast.BoolOp:
+                extra_operands = len(node.values) - 1
+                for owner in owners:
+                    owner[0] += extra_operands
+            elif node_type is ast.Call:
+                func = node.func
+                if func.__class__ is ast.Name and func.id == "print":
+                    self.smells.setdefault(node.lineno, set()).add("print_statement")
+            
+            queue.extend((child, owners) for child in ast.iter_child_nodes(node))
+        
+        for func_info, score in found:
+            self.functions.append(func_info)
+            self.complexity_scores[func_info.name] = score[0]
+
+
+# Recent analyses, keyed by a digest of the source so the cache does not
+# keep up to MAX_REVIEW_SIZE characters per entry alive
+_ANALYSIS_CACHE_SIZE = 256
+_analysis_cache: "OrderedDict[bytes, ReviewAnalysis]" = OrderedDict()
+_analysis_cache_lock = threading.Lock()
+
+
+def _analyze(code: str) -> ReviewAnalysis:
+    """
+    Parse and analyze source code in one traversal.
+    
+    Results are cached in-process (least recently used, bounded), so the
+    pipeline's tools and its loop iterations analyze each distinct input
+    only once.
+    
+    Args:
+        code: Python source code
+        
+    Returns:
+        Completed analysis (shared; callers must copy before modifying)
+        
+    Raises:
+        SyntaxError: If the code cannot be parsed
+        CodeTooLarge: If the code is longer than MAX_REVIEW_SIZE
+    """
+    if len(code) > MAX_REVIEW_SIZE:
+        raise CodeTooLarge(
+            f"Code too large to review ({len(code):,} characters, limit {MAX_REVIEW_SIZE:,})"
+        )
+    key = hashlib.blake2b(code.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+    with _analysis_cache_lock:
+        analysis = _analysis_cache.get(key)
+        if analysis is not None:
+            _analysis_cache.move_to_end(key)
+            return analysis
+    
+    analysis = ReviewAnalysis(compile(code, "<unknown>", "exec", flags=_PARSE_FLAGS, optimize=2))
+    with _analysis_cache_lock:
+        _analysis_cache[key] = analysis
+        if len(_analysis_cache) > _ANALYSIS_CACHE_SIZE:
+            _analysis_cache.popitem(last=False)
+    return analysis
+
+
+def _scan_smells(code: str) -> Dict[int, Set[str]]:
+    """Find code smells by text in source that cannot be parsed"""
+    flagged: Dict[int, Set[str]] = {}
+    line, scanned = 1, 0
+    for match in _SMELL_RE.finditer(code):
+        line += code.count("\n", scanned, match.start())
+        scanned = match.start()
+        flagged.setdefault(line, set()).add(match.lastgroup)
+    return flagged
+
+
+@tool
 def extract_functions(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Extract function definitions from Python code.
@@ -48,66 +230,47 @@ def extract_functions(state: Dict[str, Any]) -> Dict[str, Any]:
         Updated state with 'functions' list
     """
     code = state.get("code", "")
-    functions = []
     
     try:
-        tree = ast.parse(code)
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef):
-                func_info = {
-                    "name": node.name,
-                    "line_start": node.lineno,
-                    "line_end": node.end_lineno or node.lineno,
-                    "args": [arg.arg for arg in node.args.args],
-                    "num_lines": (node.end_lineno or node.lineno) - node.lineno + 1
-                }
-                functions.append(func_info)
+        functions = [func_info.to_dict() for func_info in _analyze(code).functions]
     except SyntaxError as e:
-        functions.append({
+        functions = [{
             "error": f"Syntax error in code: {str(e)}",
             "name": "unknown"
-        })
+        }]
+    except ValueError as e:
+        functions = [{
+            "error": str(e),
+            "name": "unknown"
+        }]
     
     state["functions"] = functions
     return state
 
 
+@tool
 def check_complexity(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Calculate cyclomatic complexity for each function.
     
     Args:
-        state: Must contain 'code' and 'functions' keys
+        state: Must contain 'code' key with Python source code
         
     Returns:
         Updated state with 'complexity_scores' dict
     """
     code = state.get("code", "")
-    functions = state.get("functions", [])
-    complexity_scores = {}
     
     try:
-        tree = ast.parse(code)
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef):
-                # Simple complexity calculation
-                complexity = 1  # Base complexity
-                
-                for child in ast.walk(node):
-                    # Count decision points
-                    if isinstance(child, (ast.If, ast.While, ast.For, ast.ExceptHandler)):
-                        complexity += 1
-                    elif isinstance(child, ast.BoolOp):
-                        complexity += len(child.values) - 1
-                
-                complexity_scores[node.name] = complexity
-    except:
-        pass
+        complexity_scores = dict(_analyze(code).complexity_scores)
+    except Exception:
+        complexity_scores = {}
     
     state["complexity_scores"] = complexity_scores
     return state
 
 
+@tool
 def detect_issues(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Detect code smells and potential issues.
@@ -151,10 +314,21 @@ def detect_issues(state: Dict[str, Any]) -> Dict[str, Any]:
             })
     
     # Check for common code smells
-    lines = code.split('\n')
-    for i, line in enumerate(lines, 1):
-        # Check for bare except
-        if re.search(r'except\s*:', line):
+    try:
+        flagged = _analyze(code).smells
+    except CodeTooLarge as e:
+        issues.append({
+            "type": "too_large",
+            "severity": "high",
+            "message": str(e)
+        })
+        flagged = {}
+    except (SyntaxError, ValueError):
+        flagged = _scan_smells(code)
+    
+    for i in sorted(flagged):
+        smells = flagged[i]
+        if "bare_except" in smells:
             issues.append({
                 "type": "bare_except",
                 "line": i,
@@ -162,8 +336,8 @@ def detect_issues(state: Dict[str, Any]) -> Dict[str, Any]:
                 "message": f"Line {i}: Bare except clause catches all exceptions"
             })
         
-        # Check for print statements (should use logging)
-        if re.search(r'\bprint\s*\(', line):
+        # Print statements should use logging
+        if "print_statement" in smells:
             issues.append({
                 "type": "print_statement",
                 "line": i,
@@ -175,6 +349,7 @@ def detect_issues(state: Dict[str, Any]) -> Dict[str, Any]:
     return state
 
 
+@tool
 def suggest_improvements(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Generate improvement suggestions based on detected issues.
@@ -188,13 +363,8 @@ def suggest_improvements(state: Dict[str, Any]) -> Dict[str, Any]:
     issues = state.get("issues", [])
     suggestions = []
     
-    # Group issues by type
-    issue_types = {}
-    for issue in issues:
-        issue_type = issue.get("type", "unknown")
-        if issue_type not in issue_types:
-            issue_types[issue_type] = []
-        issue_types[issue_type].append(issue)
+    # Issue types present
+    issue_types = {issue.get("type", "unknown") for issue in issues}
     
     # Generate suggestions
     if "high_complexity" in issue_types or "moderate_complexity" in issue_types:
@@ -221,6 +391,12 @@ def suggest_improvements(state: Dict[str, Any]) -> Dict[str, Any]:
             "for better control over output and debugging."
         )
     
+    if "too_large" in issue_types:
+        suggestions.append(
+            "The code was too large to analyze. "
+            "Split it into smaller modules and review them separately."
+        )
+    
     if not suggestions:
         suggestions.append("Code looks good! No major issues detected.")
     
@@ -228,31 +404,22 @@ def suggest_improvements(state: Dict[str, Any]) -> Dict[str, Any]:
     return state
 
 
+@tool
 def evaluate_quality(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Evaluate overall code quality and assign a score.
     
     Args:
-        state: Must contain 'issues' and 'functions'
+        state: Must contain 'issues' list
         
     Returns:
         Updated state with 'quality_score' (0-10) and incremented 'iteration'
     """
     issues = state.get("issues", [])
-    functions = state.get("functions", [])
     
-    # Start with perfect score
-    score = 10
-    
-    # Deduct points based on issues
-    for issue in issues:
-        severity = issue.get("severity", "low")
-        if severity == "high":
-            score -= 2
-        elif severity == "medium":
-            score -= 1
-        elif severity == "low":
-            score -= 0.5
+    # Start with perfect score and deduct points based on issue severity
+    severities = Counter(issue.get("severity", "low") for issue in issues)
+    score = 10 - 2 * severities["high"] - severities["medium"] - 0.5 * severities["low"]
     
     # Ensure score is in valid range
     score = max(0, min(10, score))
@@ -263,12 +430,30 @@ def evaluate_quality(state: Dict[str, Any]) -> Dict[str, Any]:
     return state
 
 
+@tool
+def review_code(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run the whole code review as a single tool.
+    
+    Applies extract_functions, check_complexity, detect_issues,
+    suggest_improvements and evaluate_quality in order, for graphs that
+    want one review node instead of five engine steps.
+    
+    Args:
+        state: Must contain 'code' key with Python source code
+        
+    Returns:
+        Updated state with all review results, 'quality_score' and
+        incremented 'iteration'
+    """
+    for step in (extract_functions, check_complexity, detect_issues,
+                 suggest_improvements, evaluate_quality):
+        state = step(state)
+    return state
+
+
 # ============================================================================
 # Register all tools
 # ============================================================================
 
-tool_registry.register("extract_functions", extract_functions)
-tool_registry.register("check_complexity", check_complexity)
-tool_registry.register("detect_issues", detect_issues)
-tool_registry.register("suggest_improvements", suggest_improvements)
-tool_registry.register("evaluate_quality", evaluate_quality)
+tool_registry.bulk_register(_TOOLS)
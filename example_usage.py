@@ -11,6 +11,7 @@ This script demonstrates how to:
 import requests
 import time
 import json
+from websockets.sync.client import connect
 from app.workflows.code_review import (
     get_code_review_graph_definition,
     get_sample_initial_state,
@@ -21,6 +22,13 @@ from app.workflows.code_review import (
 
 # API base URL
 BASE_URL = "http://localhost:8000"
+WS_URL = "ws://localhost:8000"
+
+# Seconds to wait for the next WebSocket message before giving up
+RUN_TIMEOUT = 15
+
+# One keep-alive connection reused for every request
+session = requests.Session()
 
 
 def create_code_review_workflow():
@@ -31,7 +39,7 @@ def create_code_review_workflow():
     
     graph_def = get_code_review_graph_definition()
     
-    response = requests.post(
+    response = session.post(
         f"{BASE_URL}/graph/create",
         json=graph_def
     )
@@ -62,7 +70,7 @@ def run_workflow(graph_id: str, code_sample: str, sample_name: str):
     print(code_sample[:200] + "..." if len(code_sample) > 200 else code_sample)
     print("-" * 60)
     
-    response = requests.post(
+    response = session.post(
         f"{BASE_URL}/graph/run",
         json={
             "graph_id": graph_id,
@@ -83,31 +91,33 @@ def run_workflow(graph_id: str, code_sample: str, sample_name: str):
 
 
 def monitor_execution(run_id: str):
-    """Monitor workflow execution until completion"""
+    """Follow workflow execution over the WebSocket until completion"""
     print("\n" + "-" * 60)
     print("Monitoring Execution...")
     print("-" * 60)
     
-    max_attempts = 30
-    attempt = 0
-    
-    while attempt < max_attempts:
-        response = requests.get(f"{BASE_URL}/graph/state/{run_id}")
-        
-        if response.status_code == 200:
-            result = response.json()
-            status = result["status"]
-            
-            print(f"\rStatus: {status} | Iteration: {result['current_state'].get('iteration', 0)}", end="")
-            
-            if status in ["completed", "failed"]:
-                print()  # New line
-                return result
-        
-        time.sleep(0.5)
-        attempt += 1
+    log_count = 0
+    try:
+        with connect(f"{WS_URL}/ws/graph/run/{run_id}") as websocket:
+            while True:
+                message = json.loads(websocket.recv(timeout=RUN_TIMEOUT))
+                
+                if message["type"] == "log":
+                    log_count += len(message["logs"])
+                    print(f"\rStatus: {message['status']} | Log entries: {log_count}", end="")
+                
+                elif message["type"] == "completed":
+                    iteration = message["final_state"].get("iteration", 0)
+                    print(f"\rStatus: {message['status']} | Iteration: {iteration}")
+                    break
+    except TimeoutError:
+        print("\n✗ Timeout waiting for workflow completion")
+        return None
     
-    print("\n✗ Timeout waiting for workflow completion")
+    # Fetch the full result, including the execution log, once
+    response = session.get(f"{BASE_URL}/graph/state/{run_id}")
+    if response.status_code == 200:
+        return response.json()
     return None
 
 
@@ -175,7 +185,7 @@ def main():
     
     # Check if API is running
     try:
-        response = requests.get(f"{BASE_URL}/health")
+        response = session.get(f"{BASE_URL}/health")
         if response.status_code != 200:
             print("✗ API is not responding. Please start the server first:")
             print("  uvicorn app.main:app --reload")
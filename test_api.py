@@ -10,11 +10,14 @@ import sys
 
 BASE_URL = "http://localhost:8000"
 
+# One keep-alive connection reused for every request
+session = requests.Session()
+
 
 def test_health():
     """Test health endpoint"""
     print("Testing /health endpoint...")
-    response = requests.get(f"{BASE_URL}/health")
+    response = session.get(f"{BASE_URL}/health")
     assert response.status_code == 200
     data = response.json()
     assert data["status"] == "healthy"
@@ -24,7 +27,7 @@ def test_health():
 def test_root():
     """Test root endpoint"""
     print("\nTesting / endpoint...")
-    response = requests.get(f"{BASE_URL}/")
+    response = session.get(f"{BASE_URL}/")
     assert response.status_code == 200
     data = response.json()
     assert "name" in data
@@ -35,7 +38,7 @@ def test_root():
 def test_list_tools():
     """Test tools listing"""
     print("\nTesting /tools endpoint...")
-    response = requests.get(f"{BASE_URL}/tools")
+    response = session.get(f"{BASE_URL}/tools")
     assert response.status_code == 200
     data = response.json()
     assert "tools" in data
@@ -62,7 +65,7 @@ def test_create_graph():
         "start_node": "extract"
     }
     
-    response = requests.post(f"{BASE_URL}/graph/create", json=graph_def)
+    response = session.post(f"{BASE_URL}/graph/create", json=graph_def)
     assert response.status_code == 200
     data = response.json()
     assert "graph_id" in data
@@ -80,7 +83,7 @@ def test_run_graph(graph_id):
         "iteration": 0
     }
     
-    response = requests.post(
+    response = session.post(
         f"{BASE_URL}/graph/run",
         json={
             "graph_id": graph_id,
@@ -101,7 +104,7 @@ def test_get_state(run_id):
     # Wait for execution to complete
     max_attempts = 20
     for _ in range(max_attempts):
-        response = requests.get(f"{BASE_URL}/graph/state/{run_id}")
+        response = session.get(f"{BASE_URL}/graph/state/{run_id}")
         assert response.status_code == 200
         data = response.json()
         
@@ -132,7 +135,7 @@ def test_invalid_graph():
         "start_node": "test"
     }
     
-    response = requests.post(f"{BASE_URL}/graph/create", json=graph_def)
+    response = session.post(f"{BASE_URL}/graph/create", json=graph_def)
     assert response.status_code == 400
     print("✓ Invalid graph rejected correctly")
 
@@ -141,7 +144,7 @@ def test_invalid_run():
     """Test error handling for invalid run"""
     print("\nTesting invalid run...")
     
-    response = requests.post(
+    response = session.post(
         f"{BASE_URL}/graph/run",
         json={
             "graph_id": "non-existent-id",
@@ -161,7 +164,7 @@ def run_all_tests():
     try:
         # Check if server is running
         try:
-            requests.get(f"{BASE_URL}/health", timeout=2)
+            session.get(f"{BASE_URL}/health", timeout=2)
         except requests.exceptions.ConnectionError:
             print("\n✗ Cannot connect to API. Please start the server first:")
             print("  uvicorn app.main:app --reload")
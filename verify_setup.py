@@ -4,291 +4,418 @@ Setup Verification Script
 
 This script verifies that the Workflow Engine is properly set up and ready to use.
 Run this before starting development or after installation.
+
+Pass --full to also create missing database tables; by default the
+database is only inspected.
 """
 
 import sys
 import os
-from pathlib import Path
-
-
-def print_header(text):
-    """Print a formatted header"""
-    print("\n" + "=" * 60)
-    print(f"  {text}")
-    print("=" * 60)
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from importlib import import_module
+from importlib.util import find_spec
+
+# ASCII status markers, printable on any console encoding
+OK, FAIL, WARN = "[OK]", "[FAIL]", "[WARN]"
+
+# Oldest supported Python version
+MIN_PYTHON = (3, 9)
+
+# Files that must exist, relative to the project root
+REQUIRED_FILES = (
+    "app/__init__.py",
+    "app/main.py",
+    "app/engine.py",
+    "app/models.py",
+    "app/tools.py",
+    "app/database.py",
+    "app/workflows/__init__.py",
+    "app/workflows/code_review.py",
+    "requirements.txt",
+    "README.md",
+)
+
+# (import name, display name) of required packages
+REQUIRED_PACKAGES = (
+    ("fastapi", "FastAPI"),
+    ("uvicorn", "Uvicorn"),
+    ("pydantic", "Pydantic"),
+    ("sqlalchemy", "SQLAlchemy"),
+    ("orjson", "orjson"),
+)
+
+# (module, description) of app modules that must import cleanly
+APP_MODULES = (
+    ("app.main", "FastAPI Application"),
+    ("app.engine", "Workflow Engine"),
+    ("app.models", "Data Models"),
+    ("app.tools", "Tool Registry"),
+    ("app.database", "Database Layer"),
+    ("app.workflows.code_review", "Code Review Workflow"),
+)
+
+# (file, description) of documentation files
+DOC_FILES = (
+    ("README.md", "Main documentation"),
+    ("QUICKSTART.md", "Quick start guide"),
+    ("API_REFERENCE.md", "API reference"),
+    ("ARCHITECTURE.md", "Architecture docs"),
+    ("PROJECT_SUMMARY.md", "Project summary"),
+)
+
+# SQLite database created by the app on first run
+DATABASE_FILE = "workflow_engine.db"
+
+# Checks that only look at files and installed packages; they run
+# concurrently and their output is replayed in the usual order
+PARALLEL_CHECKS = {"Project Structure", "Dependencies", "Documentation"}
+
+
+class Reporter:
+    """
+    Collects report lines and writes them to stdout in a single call.
+    
+    Each check gets its own reporter, so checks running on worker threads
+    never interleave their output.
+    """
+    
+    def __init__(self):
+        self.buf = []
+    
+    def line(self, text=""):
+        """Add a plain line"""
+        self.buf.append(text)
+    
+    def header(self, text):
+        """Add a formatted header"""
+        self.buf.append("\n" + "=" * 60)
+        self.buf.append(f"  {text}")
+        self.buf.append("=" * 60)
+    
+    def success(self, text):
+        """Add a success message"""
+        self.buf.append(f"{OK} {text}")
+    
+    def error(self, text):
+        """Add an error message"""
+        self.buf.append(f"{FAIL} {text}")
+    
+    def warning(self, text):
+        """Add a warning message"""
+        self.buf.append(f"{WARN} {text}")
+    
+    def flush(self):
+        """Write the collected lines and start over"""
+        if self.buf:
+            sys.stdout.write("\n".join(self.buf) + "\n")
+            sys.stdout.flush()
+            self.buf = []
 
 
-def print_success(text):
-    """Print success message"""
-    print(f"✓ {text}")
+@lru_cache(maxsize=None)
+def load_module(name):
+    """Import a module once; later calls return the same module object"""
+    return import_module(name)
 
 
-def print_error(text):
-    """Print error message"""
-    print(f"✗ {text}")
+@lru_cache(maxsize=None)
+def scan_directory(directory):
+    """
+    Map entry names in a directory to their os.DirEntry (empty if missing).
+    
+    Listings are cached, so every check shares one scan per directory, and
+    an entry's stat() result is cached on the entry itself.
+    """
+    try:
+        with os.scandir(directory) as entries:
+            return {entry.name: entry for entry in entries}
+    except OSError:
+        return {}
 
 
-def print_warning(text):
-    """Print warning message"""
-    print(f"⚠ {text}")
+def find_entry(file_path):
+    """Directory entry for a relative path, or None if it does not exist"""
+    directory, name = os.path.split(file_path)
+    return scan_directory(directory or ".").get(name)
 
 
-def check_python_version():
+def check_python_version(report):
     """Check Python version"""
-    print_header("Checking Python Version")
+    report.header("Checking Python Version")
     
-    version = sys.version_info
-    version_str = f"{version.major}.{version.minor}.{version.micro}"
+    supported = sys.version_info >= MIN_PYTHON
+    version_str = "{}.{}.{}".format(*sys.version_info[:3])
+    required = "{}.{}".format(*MIN_PYTHON)
     
-    if version.major == 3 and version.minor >= 9:
-        print_success(f"Python {version_str} (>= 3.9 required)")
+    if supported:
+        report.success(f"Python {version_str} (>= {required} required)")
         return True
     else:
-        print_error(f"Python {version_str} (>= 3.9 required)")
-        print("  Please upgrade Python to 3.9 or higher")
+        report.error(f"Python {version_str} (>= {required} required)")
+        report.line(f"  Please upgrade Python to {required} or higher")
         return False
 
 
-def check_project_structure():
+def check_project_structure(report):
     """Check if all required files exist"""
-    print_header("Checking Project Structure")
-    
-    required_files = [
-        "app/__init__.py",
-        "app/main.py",
-        "app/engine.py",
-        "app/models.py",
-        "app/tools.py",
-        "app/database.py",
-        "app/workflows/__init__.py",
-        "app/workflows/code_review.py",
-        "requirements.txt",
-        "README.md",
-    ]
+    report.header("Checking Project Structure")
     
     all_exist = True
-    for file_path in required_files:
-        if Path(file_path).exists():
-            print_success(f"{file_path}")
+    for file_path in REQUIRED_FILES:
+        if find_entry(file_path) is not None:
+            report.success(f"{file_path}")
         else:
-            print_error(f"{file_path} - MISSING")
+            report.error(f"{file_path} - MISSING")
             all_exist = False
     
     return all_exist
 
 
-def check_dependencies():
+def check_dependencies(report):
     """Check if required packages are installed"""
-    print_header("Checking Dependencies")
-    
-    required_packages = [
-        ("fastapi", "FastAPI"),
-        ("uvicorn", "Uvicorn"),
-        ("pydantic", "Pydantic"),
-        ("sqlalchemy", "SQLAlchemy"),
-    ]
+    report.header("Checking Dependencies")
     
+    # Locate each package without importing it; the module import check
+    # below loads what the app actually uses
     all_installed = True
-    for package, name in required_packages:
-        try:
-            __import__(package)
-            print_success(f"{name}")
-        except ImportError:
-            print_error(f"{name} - NOT INSTALLED")
+    for package, name in REQUIRED_PACKAGES:
+        if find_spec(package) is not None:
+            report.success(f"{name}")
+        else:
+            report.error(f"{name} - NOT INSTALLED")
             all_installed = False
     
     if not all_installed:
-        print("\n  Install dependencies with:")
-        print("  pip install -r requirements.txt")
+        report.line("\n  Install dependencies with:")
+        report.line("  pip install -r requirements.txt")
     
     return all_installed
 
 
-def check_imports():
+def check_imports(report):
     """Check if app modules can be imported"""
-    print_header("Checking Module Imports")
-    
-    modules = [
-        ("app.main", "FastAPI Application"),
-        ("app.engine", "Workflow Engine"),
-        ("app.models", "Data Models"),
-        ("app.tools", "Tool Registry"),
-        ("app.database", "Database Layer"),
-        ("app.workflows.code_review", "Code Review Workflow"),
-    ]
+    report.header("Checking Module Imports")
     
+    loaded = sys.modules
     all_imported = True
-    for module, name in modules:
+    for module, name in APP_MODULES:
+        # Modules pulled in by an earlier import are already known to load
+        if module in loaded:
+            report.success(f"{name}")
+            continue
+        
         try:
-            __import__(module)
-            print_success(f"{name}")
+            load_module(module)
+            report.success(f"{name}")
         except Exception as e:
-            print_error(f"{name} - {str(e)}")
+            report.error(f"{name} - {str(e)}")
             all_imported = False
     
     return all_imported
 
 
-def check_database():
-    """Check database setup"""
-    print_header("Checking Database")
+def check_database(report, full=False):
+    """
+    Check database setup.
+    
+    Compares the tables in the database with the app's models without
+    running DDL; with full, table creation is run first. A database that
+    does not exist yet is only a warning, since the server creates it on
+    startup.
+    """
+    report.header("Checking Database")
     
     try:
-        from app.database import engine, Base
+        database = load_module("app.database")
         
-        # Try to create tables
-        Base.metadata.create_all(bind=engine)
-        print_success("Database tables created successfully")
+        if full:
+            database.init_db()
+            report.success("Database tables created successfully")
+        elif not os.path.exists(DATABASE_FILE):
+            # Connecting would create an empty database file
+            report.warning("Database file will be created on first run")
+            return True
         
-        # Check if database file exists
-        if Path("workflow_engine.db").exists():
-            print_success("Database file exists")
-        else:
-            print_warning("Database file will be created on first run")
+        existing = load_module("sqlalchemy").inspect(database.engine).get_table_names()
+        missing = sorted(set(database.Base.metadata.tables) - set(existing))
+        if missing:
+            report.error(f"Missing database tables: {', '.join(missing)}")
+            report.line("  Run with --full to create them")
+            return False
+        report.success(f"Database tables present: {', '.join(sorted(existing))}")
         
         return True
     except Exception as e:
-        print_error(f"Database setup failed: {str(e)}")
+        report.error(f"Database setup failed: {str(e)}")
         return False
 
 
-def check_tools():
+def check_tools(report):
     """Check if tools are registered"""
-    print_header("Checking Tool Registry")
+    report.header("Checking Tool Registry")
     
     try:
-        from app.tools import tool_registry
-        
-        tools = tool_registry.list_tools()
+        tools = load_module("app.tools").tool_registry.list_tools()
         
         if len(tools) > 0:
-            print_success(f"Found {len(tools)} registered tools:")
+            report.success(f"Found {len(tools)} registered tools:")
             for tool in tools:
-                print(f"  - {tool}")
+                report.line(f"  - {tool}")
             return True
         else:
-            print_error("No tools registered")
+            report.error("No tools registered")
             return False
     except Exception as e:
-        print_error(f"Tool registry check failed: {str(e)}")
+        report.error(f"Tool registry check failed: {str(e)}")
         return False
 
 
-def check_example_workflow():
+def check_example_workflow(report):
     """Check if example workflow is valid"""
-    print_header("Checking Example Workflow")
+    report.header("Checking Example Workflow")
     
     try:
-        from app.workflows.code_review import (
-            get_code_review_graph_definition,
-            get_sample_initial_state
-        )
+        code_review = load_module("app.workflows.code_review")
         
-        graph_def = get_code_review_graph_definition()
-        initial_state = get_sample_initial_state()
+        graph_def = code_review.get_code_review_graph_definition()
+        initial_state = code_review.get_sample_initial_state()
         
-        print_success("Code review workflow definition loaded")
-        print_success(f"  Nodes: {len(graph_def['nodes'])}")
-        print_success(f"  Start node: {graph_def['start_node']}")
-        print_success(f"  Initial state keys: {list(initial_state.keys())}")
+        report.success("Code review workflow definition loaded")
+        report.success(f"  Nodes: {len(graph_def['nodes'])}")
+        report.success(f"  Start node: {graph_def['start_node']}")
+        report.success(f"  Initial state keys: {list(initial_state.keys())}")
         
         return True
     except Exception as e:
-        print_error(f"Example workflow check failed: {str(e)}")
+        report.error(f"Example workflow check failed: {str(e)}")
         return False
 
 
-def check_documentation():
+def check_documentation(report):
     """Check if documentation files exist"""
-    print_header("Checking Documentation")
-    
-    doc_files = [
-        ("README.md", "Main documentation"),
-        ("QUICKSTART.md", "Quick start guide"),
-        ("API_REFERENCE.md", "API reference"),
-        ("ARCHITECTURE.md", "Architecture docs"),
-        ("PROJECT_SUMMARY.md", "Project summary"),
-    ]
+    report.header("Checking Documentation")
     
     all_exist = True
-    for file_path, description in doc_files:
-        if Path(file_path).exists():
-            size = Path(file_path).stat().st_size
-            print_success(f"{description} ({size:,} bytes)")
+    for file_path, description in DOC_FILES:
+        entry = find_entry(file_path)
+        if entry is not None:
+            size = entry.stat().st_size
+            report.success(f"{description} ({size:,} bytes)")
         else:
-            print_warning(f"{description} - MISSING")
+            report.warning(f"{description} - MISSING")
             all_exist = False
     
     return all_exist
 
 
-def print_next_steps():
+def print_next_steps(report):
     """Print next steps"""
-    print_header("Next Steps")
+    report.header("Next Steps")
     
-    print("\n1. Start the server:")
-    print("   uvicorn app.main:app --reload")
+    report.line("\n1. Start the server:")
+    report.line("   uvicorn app.main:app --reload")
     
-    print("\n2. Open API documentation:")
-    print("   http://localhost:8000/docs")
+    report.line("\n2. Open API documentation:")
+    report.line("   http://localhost:8000/docs")
     
-    print("\n3. Run the example:")
-    print("   python example_usage.py")
+    report.line("\n3. Run the example:")
+    report.line("   python example_usage.py")
     
-    print("\n4. Run tests:")
-    print("   python test_api.py")
+    report.line("\n4. Run tests:")
+    report.line("   python test_api.py")
     
-    print("\n5. Read the documentation:")
-    print("   - README.md - Overview and features")
-    print("   - QUICKSTART.md - Get started quickly")
-    print("   - API_REFERENCE.md - Complete API docs")
-    print("   - ARCHITECTURE.md - System design")
+    report.line("\n5. Read the documentation:")
+    report.line("   - README.md - Overview and features")
+    report.line("   - QUICKSTART.md - Get started quickly")
+    report.line("   - API_REFERENCE.md - Complete API docs")
+    report.line("   - ARCHITECTURE.md - System design")
+
+
+def run_check(name, check_func, report):
+    """Run a check, treating unexpected exceptions as a failure"""
+    try:
+        return check_func(report)
+    except Exception as e:
+        report.error(f"Unexpected error in {name}: {str(e)}")
+        return False
+
+
+def run_pooled(name, check_func):
+    """Run a check on a worker thread, returning its result and report"""
+    report = Reporter()
+    return run_check(name, check_func, report), report
 
 
 def main():
     """Main verification flow"""
-    print("\n" + "=" * 60)
-    print("  Workflow Engine - Setup Verification")
-    print("=" * 60)
+    report = Reporter()
+    report.line("\n" + "=" * 60)
+    report.line("  Workflow Engine - Setup Verification")
+    report.line("=" * 60)
+    report.flush()
     
+    # (name, check, prerequisites); a check is skipped unless all of its
+    # prerequisites passed
     checks = [
-        ("Python Version", check_python_version),
-        ("Project Structure", check_project_structure),
-        ("Dependencies", check_dependencies),
-        ("Module Imports", check_imports),
-        ("Database", check_database),
-        ("Tool Registry", check_tools),
-        ("Example Workflow", check_example_workflow),
-        ("Documentation", check_documentation),
+        ("Python Version", check_python_version, ()),
+        ("Project Structure", check_project_structure, ("Python Version",)),
+        ("Dependencies", check_dependencies, ("Python Version",)),
+        ("Module Imports", check_imports, ("Dependencies",)),
+        ("Database", partial(check_database, full="--full" in sys.argv[1:]), ("Dependencies",)),
+        ("Tool Registry", check_tools, ("Dependencies",)),
+        ("Example Workflow", check_example_workflow, ("Dependencies",)),
+        ("Documentation", check_documentation, ("Python Version",)),
     ]
     
-    results = []
-    for name, check_func in checks:
-        try:
-            result = check_func()
-            results.append((name, result))
-        except Exception as e:
-            print_error(f"Unexpected error in {name}: {str(e)}")
-            results.append((name, False))
+    results = {}  # Check name -> True/False, or None if skipped
+    with ThreadPoolExecutor(max_workers=len(PARALLEL_CHECKS)) as executor:
+        futures = {}
+        
+        def start_ready_checks():
+            """Start parallel checks whose prerequisites have passed"""
+            for name, check_func, prereqs in checks:
+                if (name in PARALLEL_CHECKS and name not in futures
+                        and all(results.get(prereq) for prereq in prereqs)):
+                    futures[name] = executor.submit(run_pooled, name, check_func)
+        
+        for name, check_func, prereqs in checks:
+            failed = [prereq for prereq in prereqs if not results.get(prereq)]
+            if failed:
+                report.warning(f"Skipping {name}: {', '.join(failed)} did not pass")
+                report.flush()
+                results[name] = None
+                continue
+            
+            if name in futures:
+                result, check_report = futures[name].result()
+            else:
+                check_report = Reporter()
+                result = run_check(name, check_func, check_report)
+            check_report.flush()
+            results[name] = result
+            start_ready_checks()
     
     # Summary
-    print_header("Verification Summary")
+    report.header("Verification Summary")
     
-    passed = sum(1 for _, result in results if result)
+    passed = sum(1 for result in results.values() if result)
     total = len(results)
     
-    for name, result in results:
-        status = "✓ PASS" if result else "✗ FAIL"
-        print(f"{status:8} - {name}")
+    for name, result in results.items():
+        status = "[SKIP]" if result is None else "[PASS]" if result else FAIL
+        report.line(f"{status:8} - {name}")
     
-    print(f"\nPassed: {passed}/{total}")
+    report.line(f"\nPassed: {passed}/{total}")
     
     if passed == total:
-        print("\n🎉 All checks passed! Your setup is ready.")
-        print_next_steps()
+        report.line("\nAll checks passed! Your setup is ready.")
+        print_next_steps(report)
+        report.flush()
         return 0
     else:
-        print("\n⚠️  Some checks failed. Please fix the issues above.")
+        report.line(f"\n{WARN} Some checks failed. Please fix the issues above.")
+        report.flush()
         return 1
 
 